@@ -1,5 +1,3 @@
-from datetime import datetime
-
 from app import db
 
 
@@ -10,8 +8,8 @@ class User(db.Model):
     email = db.Column(db.String(500), unique=True, nullable=False)
     password_hash = db.Column(db.String(500), nullable=False)
 
-    posts = db.relationship("Post", backref="author", lazy=True)
-    comments = db.relationship("Comment", backref="author", lazy=True)
+    posts = db.relationship("Post", back_populates="author", lazy="select")
+    comments = db.relationship("Comment", back_populates="author", lazy="select")
 
 
 # Post Model
@@ -19,20 +17,40 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(
+        db.DateTime(timezone=True), server_default=db.func.now(), nullable=False
+    )
     updated_at = db.Column(
-        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+        db.DateTime(timezone=True),
+        server_default=db.func.now(),
+        onupdate=db.func.now(),
+        nullable=False,
     )
 
-    author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    author_id = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
+    author = db.relationship("User", back_populates="posts", lazy="joined")
     comments = db.relationship("Comment", backref="post", lazy=True)
 
+    # Supports keyset pagination of the newest posts first
+    __table_args__ = (
+        db.Index("ix_post_created_id", created_at.desc(), id.desc()),
+    )
+
 
 # Comment Model
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(
+        db.DateTime(timezone=True), server_default=db.func.now(), nullable=False
+    )
 
-    post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
-    author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    post_id = db.Column(
+        db.Integer, db.ForeignKey("post.id"), nullable=False, index=True
+    )
+    author_id = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
+    author = db.relationship("User", back_populates="comments", lazy="joined")
@@ -1,14 +1,112 @@
+import hashlib
+from datetime import datetime, timezone
+
+import bcrypt
+import orjson
+import redis
 from email_validator import (  # You can install with 'pip install email-validator'
     EmailNotValidError,
     validate_email,
 )
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
-from werkzeug.security import check_password_hash, generate_password_hash
+from psycopg.errors import DataError, ForeignKeyViolation
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, raiseload
+from werkzeug.security import check_password_hash
 
-from app import app, db
+from app import app, cache, db
 from app.models import Comment, Post, User
 
+# How long serialized posts stay in Redis, in seconds
+POST_CACHE_TTL = 3600
+
+# Most comments accepted by one bulk request
+BULK_COMMENT_LIMIT = 1000
+
+
+def loader_options(*options):
+    # In debug mode, fail loudly on any relationship that wasn't loaded up front
+    if app.config["DEBUG"]:
+        return [*options, raiseload("*")]
+    return list(options)
+
+
+def hash_password(password):
+    salt = bcrypt.gensalt(rounds=app.config["BCRYPT_ROUNDS"])
+    return bcrypt.hashpw(password.encode(), salt).decode()
+
+
+def verify_password(password_hash, password):
+    # Accounts registered before the switch to bcrypt still have Werkzeug hashes
+    if not password_hash.startswith("$2"):
+        return check_password_hash(password_hash, password)
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+
+def get_current_user_id():
+    # Tokens carry the user id as a string; convert it once per request so it
+    # compares directly with the integer author_id columns
+    if "user_id" not in g:
+        g.user_id = int(get_jwt_identity())
+    return g.user_id
+
+
+def make_etag(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def dump_json(data):
+    # orjson is much faster than jsonify for large lists and emits RFC 3339
+    # timestamps directly. UTC is written as "Z" so pagination cursors survive
+    # being pasted into a query string without percent-encoding
+    return orjson.dumps(data, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+
+
+def json_response(data):
+    return app.response_class(dump_json(data), mimetype="application/json")
+
+
+def cache_call(method, *args, **kwargs):
+    # Redis is only a cache, so if it's unavailable log it and let the caller
+    # fall back to Postgres
+    try:
+        return getattr(cache, method)(*args, **kwargs)
+    except redis.RedisError as e:
+        app.logger.warning("Redis %s failed: %s", method, e)
+        return None
+
+
+def post_cache_key(id):
+    # Versioned like the list cache: a reader that fetched the old row before an
+    # update can only fill the previous version's key, which nobody reads again
+    version = int(cache_call("get", f"post:{id}:version") or 0)
+    return f"post:{id}:v{version}"
+
+
+def invalidate_post(id):
+    if cache_call("incr", f"post:{id}:version") is None:
+        app.logger.error(
+            "Could not invalidate post %s; it may be served stale for %ss",
+            id,
+            POST_CACHE_TTL,
+        )
+
+
+def posts_list_cache_key(limit):
+    # Bumping the version whenever posts change invalidates every cached page
+    version = int(cache_call("get", "posts:list:version") or 0)
+    return f"posts:list:v{version}:{limit}"
+
+
+def invalidate_posts_list():
+    if cache_call("incr", "posts:list:version") is None:
+        app.logger.error(
+            "Could not invalidate the posts list; it may be served stale for %ss",
+            POST_CACHE_TTL,
+        )
+
 
 # Register new user
 @app.route("/register", methods=["POST"])
@@ -22,18 +120,15 @@ def register_user():
         ), 400
 
     try:
-        # Validate email format
+        # Validate email format only; a DNS deliverability check would add a
+        # network round trip to every registration
         try:
-            validate_email(data["email"])
+            validate_email(data["email"], check_deliverability=False)
         except EmailNotValidError as e:
             return jsonify({"message": f"Invalid email address: {str(e)}"}), 400
 
-        # Check if the username already exists in the database
-        if User.query.filter_by(username=data["username"]).first():
-            return jsonify({"message": "Username already exists!"}), 400
-
         # Hash the password
-        hashed_password = generate_password_hash(data["password"])
+        hashed_password = hash_password(data["password"])
 
         # Create the new user and save to the database
         new_user = User(
@@ -47,6 +142,19 @@ def register_user():
 
         return jsonify({"message": "User created successfully!"}), 201
 
+    except IntegrityError as e:
+        # The unique constraints catch duplicates without a lookup beforehand
+        db.session.rollback()
+        constraint = e.orig.diag.constraint_name
+        if constraint == "user_username_key":
+            return jsonify({"message": "Username already exists!"}), 400
+        if constraint == "user_email_key":
+            return jsonify({"message": "Email already exists!"}), 400
+
+        # Any other violation is unexpected, so report it like other errors
+        print(f"Error: {e}")
+        return jsonify({"message": "Internal Server Error", "error": str(e)}), 500
+
     except Exception as e:
         # Log the error and return an internal server error
         print(f"Error: {e}")
@@ -71,7 +179,7 @@ def login_user():
     user = User.query.filter_by(username=data["username"]).first()
 
     # If user is found and password matches
-    if user and check_password_hash(user.password_hash, data["password"]):
+    if user and verify_password(user.password_hash, data["password"]):
         # Create access token for the user
         access_token = create_access_token(identity=str(user.id))
         return jsonify(access_token=access_token)
@@ -90,54 +198,130 @@ def create_post():
     if not data.get("title") or not data.get("content"):
         return jsonify({"message": "Title and content are required!"}), 400
 
-    current_user_id = get_jwt_identity()
+    current_user_id = get_current_user_id()
 
     try:
-        # Create the new post
-        new_post = Post(
-            title=data["title"], content=data["content"], author_id=current_user_id
-        )
-
-        # Add the post to the database and commit
-        db.session.add(new_post)
+        # Insert the new post and get its generated fields in the same round trip
+        new_post = db.session.execute(
+            insert(Post)
+            .values(
+                title=data["title"], content=data["content"], author_id=current_user_id
+            )
+            .returning(Post.id, Post.created_at)
+        ).one()
         db.session.commit()
 
-        return jsonify({"message": "Post created successfully!"}), 201
-
     except Exception as e:
         # If there is any error with the database, return a 500 Internal Server Error
         return jsonify({"message": "Error creating post", "error": str(e)}), 500
 
+    invalidate_posts_list()
+
+    return json_response(
+        {
+            "message": "Post created successfully!",
+            "id": new_post.id,
+            "created_at": new_post.created_at,
+        }
+    ), 201
+
 
 # Get all Posts
 @app.route("/posts", methods=["GET"])
 def get_posts():
-    posts = Post.query.all()
-    return jsonify(
-        [
-            {
-                "id": post.id,
-                "title": post.title,
-                "content": post.content,
-                "author": post.author.username,
-                "created_at": post.created_at,
-                "updated_at": post.updated_at,
-            }
-            for post in posts
-        ]
+    limit = request.args.get("limit", 50, type=int)
+    after_created_at = request.args.get("after_created_at")
+    after_id = request.args.get("after_id", type=int)
+
+    if not 1 <= limit <= 100:
+        return jsonify({"message": "Limit must be between 1 and 100"}), 400
+
+    # Seek past the last post of the previous page instead of using OFFSET
+    after_ts = None
+    if after_created_at is not None or after_id is not None:
+        try:
+            # fromisoformat only accepts a "Z" suffix from Python 3.11
+            after_ts = datetime.fromisoformat(after_created_at.replace("Z", "+00:00"))
+        except (AttributeError, ValueError):
+            return jsonify({"message": "Invalid pagination cursor"}), 400
+        if after_id is None:
+            return jsonify({"message": "Invalid pagination cursor"}), 400
+
+        # Treat cursors without an offset as UTC
+        if after_ts.tzinfo is None:
+            after_ts = after_ts.replace(tzinfo=timezone.utc)
+
+    # Only the first page is cached, since that's what most readers ask for
+    cache_key = posts_list_cache_key(limit) if after_ts is None else None
+    body = cache_call("get", cache_key) if cache_key else None
+
+    if body is None:
+        body = dump_json(fetch_posts_page(limit, after_ts, after_id))
+        if cache_key:
+            cache_call("set", cache_key, body, ex=POST_CACHE_TTL)
+
+    response = app.response_class(body, mimetype="application/json")
+
+    # Let clients revalidate with If-None-Match and proxies cache briefly
+    response.set_etag(make_etag(body))
+    response.cache_control.public = True
+    response.cache_control.max_age = 30
+    return response.make_conditional(request)
+
+
+def fetch_posts_page(limit, after_ts=None, after_id=None):
+    # Select only the columns we return, joined with the author's username,
+    # so no ORM objects need to be built
+    query = (
+        select(
+            Post.id,
+            Post.title,
+            Post.content,
+            User.username.label("author"),
+            Post.created_at,
+            Post.updated_at,
+        )
+        .join(User, User.id == Post.author_id)
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(limit)
     )
 
+    if after_ts is not None:
+        query = query.where(
+            tuple_(Post.created_at, Post.id) < tuple_(after_ts, after_id)
+        )
+
+    posts = [dict(row._mapping) for row in db.session.execute(query).all()]
+
+    next_cursor = None
+    if len(posts) == limit:
+        next_cursor = {
+            "after_created_at": posts[-1]["created_at"],
+            "after_id": posts[-1]["id"],
+        }
+
+    return {"posts": posts, "next_cursor": next_cursor}
+
 
 # Get single post
 @app.route("/posts/<int:id>", methods=["GET"])
 def get_post(id):
-    # Retrieve the post by its ID
-    post = Post.query.get(id)
+    # Serve the already serialized post from Redis when we have it. The key is
+    # worked out before reading Postgres so a concurrent update can't be missed
+    cache_key = post_cache_key(id)
+    body = cache_call("get", cache_key)
+
+    if body is None:
+        # Retrieve the post by its ID along with its author
+        post = db.session.get(
+            Post, id, options=loader_options(joinedload(Post.author))
+        )
 
-    # Check if the post exists
-    if post:
-        # Return the post details as a JSON response
-        return jsonify(
+        # If post doesn't exist, return an error message
+        if not post:
+            return jsonify({"message": "Post not found!"}), 404
+
+        body = dump_json(
             {
                 "id": post.id,
                 "title": post.title,
@@ -147,9 +331,13 @@ def get_post(id):
                 "updated_at": post.updated_at,
             }
         )
+        cache_call("set", cache_key, body, ex=POST_CACHE_TTL)
 
-    # If post doesn't exist, return an error message
-    return jsonify({"message": "Post not found!"}), 404
+    # Return the post details as a JSON response, or a 304 if the client's
+    # copy is still current
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(make_etag(body))
+    return response.make_conditional(request)
 
 
 # Update post
@@ -167,7 +355,7 @@ def update_post(id):
         return jsonify({"message": "Title and content are required!"}), 400
 
     # Get the post by id
-    post = Post.query.get(id)
+    post = db.session.get(Post, id)
 
     if not post:
         return jsonify({"message": "Post not found!"}), 404
@@ -179,31 +367,35 @@ def update_post(id):
     try:
         # Commit the changes to the database
         db.session.commit()
-        return jsonify(
-            {
-                "message": "Post updated successfully!",
-                "post": {
-                    "id": post.id,
-                    "title": post.title,
-                    "content": post.content,
-                    "author": post.author.username,
-                    "created_at": post.created_at,
-                    "updated_at": post.updated_at,
-                },
-            }
-        ), 200
     except Exception as e:
         # Handle any errors during the commit
         db.session.rollback()  # Rollback in case of error
         return jsonify({"message": "Error updating post", "error": str(e)}), 500
 
+    invalidate_post(id)
+    invalidate_posts_list()
+
+    return json_response(
+        {
+            "message": "Post updated successfully!",
+            "post": {
+                "id": post.id,
+                "title": post.title,
+                "content": post.content,
+                "author": post.author.username,
+                "created_at": post.created_at,
+                "updated_at": post.updated_at,
+            },
+        }
+    ), 200
+
 
 # Delete post
 @app.route("/posts/<int:id>", methods=["DELETE"])
 @jwt_required()
 def delete_post(id):
     # Get the post by id
-    post = Post.query.get(id)
+    post = db.session.get(Post, id)
 
     if not post:
         return jsonify({"message": "Post not found!"}), 404
@@ -211,6 +403,8 @@ def delete_post(id):
     # Delete the post
     db.session.delete(post)
     db.session.commit()
+    invalidate_post(id)
+    invalidate_posts_list()
 
     return jsonify({"message": "Post deleted successfully!"}), 200
 
@@ -220,16 +414,81 @@ def delete_post(id):
 @jwt_required()
 def create_comment():
     data = request.get_json()
-    current_user_id = get_jwt_identity()
-    post = Post.query.get(data["post_id"])
+    current_user_id = get_current_user_id()
+    post = db.session.get(Post, data["post_id"])
     if not post:
         return jsonify({"message": "Post not found"}), 404
-    new_comment = Comment(
-        content=data["content"], post_id=data["post_id"], author_id=current_user_id
-    )
-    db.session.add(new_comment)
+    new_comment = db.session.execute(
+        insert(Comment)
+        .values(
+            content=data["content"], post_id=data["post_id"], author_id=current_user_id
+        )
+        .returning(Comment.id, Comment.created_at)
+    ).one()
     db.session.commit()
-    return jsonify({"message": "Comment created successfully!"}), 201
+    return json_response(
+        {
+            "message": "Comment created successfully!",
+            "id": new_comment.id,
+            "created_at": new_comment.created_at,
+        }
+    ), 201
+
+
+def is_valid_bulk_comment(row):
+    # bool is a subclass of int, so rule it out explicitly
+    return (
+        isinstance(row, dict)
+        and isinstance(row.get("content"), str)
+        and row["content"] != ""
+        and isinstance(row.get("post_id"), int)
+        and not isinstance(row["post_id"], bool)
+    )
+
+
+# Create many comments at once
+@app.route("/comments/bulk", methods=["POST"])
+@jwt_required()
+def create_comments_bulk():
+    data = request.get_json()
+
+    if not isinstance(data, list) or not data:
+        return jsonify({"message": "A list of comments is required!"}), 400
+
+    if len(data) > BULK_COMMENT_LIMIT:
+        return jsonify(
+            {"message": f"At most {BULK_COMMENT_LIMIT} comments can be created at once"}
+        ), 400
+
+    if not all(is_valid_bulk_comment(row) for row in data):
+        return jsonify(
+            {"message": "Each comment needs a string content and an integer post_id!"}
+        ), 400
+
+    current_user_id = get_current_user_id()
+
+    try:
+        # Stream every row to Postgres with a single COPY instead of one INSERT
+        # per comment
+        conn = db.session.connection().connection.driver_connection
+        with conn.cursor() as cursor:
+            with cursor.copy(
+                "COPY comment (content, post_id, author_id) FROM STDIN"
+            ) as copy:
+                for row in data:
+                    copy.write_row((row["content"], row["post_id"], current_user_id))
+        db.session.commit()
+
+    except ForeignKeyViolation:
+        db.session.rollback()
+        return jsonify({"message": "Post not found"}), 404
+
+    except DataError as e:
+        # Values Postgres can't store, e.g. a post_id outside the integer range
+        db.session.rollback()
+        return jsonify({"message": "Invalid comment data", "error": str(e)}), 400
+
+    return jsonify({"message": f"{len(data)} comments created successfully!"}), 201
 
 
 # Get comments for a post
@@ -241,29 +500,28 @@ def get_comments():
         return jsonify({"message": "Post ID is required"}), 400
 
     # Get the comments for the given post
-    comments = Comment.query.filter_by(post_id=post_id).all()
+    rows = db.session.execute(
+        select(
+            Comment.id,
+            Comment.content,
+            User.username.label("author"),
+            Comment.created_at,
+        )
+        .join(User, User.id == Comment.author_id)
+        .where(Comment.post_id == post_id)
+    ).all()
 
-    if not comments:
+    if not rows:
         return jsonify({"message": "No comments found for this post."}), 404
 
-    return jsonify(
-        [
-            {
-                "id": comment.id,
-                "content": comment.content,
-                "author": comment.author.username,
-                "created_at": comment.created_at,
-            }
-            for comment in comments
-        ]
-    )
+    return json_response([dict(row._mapping) for row in rows])
 
 
 # Get single comment
 @app.route("/comments/<int:id>", methods=["GET"])
 def get_single_comment(id):
     # Get the comment by id
-    comment = Comment.query.get(id)
+    comment = db.session.get(Comment, id)
 
     if not comment:
         return jsonify({"message": "Comment not found!"}), 404
@@ -285,13 +543,13 @@ def update_comment(id):
     data = request.get_json()
 
     # Get the comment by id
-    comment = Comment.query.get(id)
+    comment = db.session.get(Comment, id)
 
     if not comment:
         return jsonify({"message": "Comment not found!"}), 404
 
     # Ensure the current user is the author of the comment
-    current_user_id = get_jwt_identity()
+    current_user_id = get_current_user_id()
     if comment.author_id != current_user_id:
         return jsonify(
             {"message": "You are not authorized to update this comment!"}
@@ -311,13 +569,13 @@ def update_comment(id):
 @jwt_required()
 def delete_comment(id):
     # Get the comment by id
-    comment = Comment.query.get(id)
+    comment = db.session.get(Comment, id)
 
     if not comment:
         return jsonify({"message": "Comment not found!"}), 404
 
     # Ensure the current user is the author of the comment
-    current_user_id = get_jwt_identity()
+    current_user_id = get_current_user_id()
     if comment.author_id != current_user_id:
         return jsonify(
             {"message": "You are not authorized to delete this comment!"}
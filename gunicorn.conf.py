@@ -0,0 +1,17 @@
+import os
+
+# Threaded workers: bcrypt releases the GIL while hashing and psycopg waits on
+# the database, so threads give real concurrency without monkey-patching
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+
+def post_fork(server, worker):
+    # app/__init__.py sizes each worker's connection pool from GUNICORN_THREADS.
+    # The app is imported after this hook runs, so pass on the thread count
+    # gunicorn actually resolved, including --threads or GUNICORN_CMD_ARGS.
+    # This doesn't work with preload_app, which imports the app before forking
+    os.environ["GUNICORN_THREADS"] = str(worker.cfg.threads)